@@ -1,8 +1,24 @@
 import sys
 import os
+import re
+import html
+import bisect
+import itertools
+import json
+import stat
+import threading
 import markdown
 import pdfkit
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, unquote
+from urllib.request import url2pathname
+from markdown.extensions import Extension
+from markdown.extensions.toc import slugify, unique
+from markdown.treeprocessors import Treeprocessor
+from xml.etree import ElementTree as etree
+
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -18,22 +34,52 @@ from PyQt5.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QCheckBox,
+    QSpinBox,
     QColorDialog,
     QSplitter,
     QTextBrowser,
     QPlainTextEdit,
-    QMenu
+    QMenu,
+    QDockWidget,
+    QListWidget,
+    QListWidgetItem
 )
-from PyQt5.QtCore import Qt, QTimer, QFileSystemWatcher
+from PyQt5.QtCore import Qt, QTimer, QFileSystemWatcher, QObject, QEvent, QSettings, pyqtSignal
+from PyQt5.QtGui import QTextCursor, QKeySequence, QColor, QPainter, QFont, QPalette
+
+try:
+    from pygments.formatters import HtmlFormatter
+except ImportError:  # pygments is optional; code blocks are then left unstyled
+    HtmlFormatter = None
+
+# Shared by the live preview and the exporters. The toc extension still gives
+# ids to headings the outline does not know; [TOC] is filled in by OutlineExtension.
+MARKDOWN_EXTENSIONS = ["extra", "toc", "tables", "pymdownx.highlight", "pymdownx.extra", "pymdownx.superfences"]
+MARKDOWN_EXTENSION_CONFIGS = {"toc": {"marker": ""}}
+TOC_MARKER = "[TOC]"
+HEADING_TAG_RE = re.compile(r"^h[1-6]$")
+WINDOWS_PATH_RE = re.compile(r"^[A-Za-z]:[\\/]")
+
+# Session persistence (QSettings)
+SETTINGS_ORGANIZATION = "OhPyMark"
+SETTINGS_APPLICATION = "OhPyMark"
+MAX_SESSION_DOCUMENTS = 20
+
+STYLESHEET_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+FONT_SIZE_RE = re.compile(r"^\s*([\d.]+)\s*(px|pt)\s*$")
+# Code blocks keep one highlighting style, on its own background, in every theme
+CODE_HIGHLIGHT_STYLE = "default"
+CODE_TEXT_COLOR = "#000000"
 
 #
 # DIALOG: Find & Replace
 #
 class FindReplaceDialog(QDialog):
     """Simple Find/Replace dialog for QPlainTextEdit."""
-    def __init__(self, editor):
+    def __init__(self, editor, undo_history):
         super().__init__()
         self.editor = editor
+        self.undo_history = undo_history
         self.setWindowTitle("Find & Replace")
         self.initUI()
 
@@ -120,25 +166,27 @@ class FindReplaceDialog(QDialog):
             return
 
         doc_text = self.editor.toPlainText()
-        if self.case_checkbox.isChecked():
-            count = doc_text.count(find_text)
-            new_text = doc_text.replace(find_text, replace_text)
+        case_sensitive = self.case_checkbox.isChecked()
+        if case_sensitive:
+            haystack, needle = doc_text, find_text
         else:
             # naive case-insensitive approach
-            lower_doc = doc_text.lower()
-            lower_find = find_text.lower()
-            count = lower_doc.count(lower_find)
-            new_text = ""
-            start = 0
-            while True:
-                idx = lower_doc.find(lower_find, start)
-                if idx == -1:
-                    new_text += doc_text[start:]
-                    break
-                new_text += doc_text[start:idx] + replace_text
-                start = idx + len(find_text)
-
-        self.editor.setPlainText(new_text)
+            haystack, needle = doc_text.lower(), find_text.lower()
+
+        # Record only the replaced segments so the change can be undone cheaply
+        hunks = []
+        start = 0
+        while True:
+            idx = haystack.find(needle, start)
+            if idx == -1:
+                break
+            old_segment = find_text if case_sensitive else doc_text[idx:idx + len(find_text)]
+            hunks.append((idx, old_segment, replace_text))
+            start = idx + len(find_text)
+        count = len(hunks)
+
+        if hunks and not self.undo_history.apply(doc_text, hunks):
+            return
         QMessageBox.information(self, "Replace All", f"Replaced {count} occurrences.")
 
 
@@ -166,6 +214,23 @@ class PreferencesDialog(QDialog):
 
         layout.addLayout(pick_bg_color_layout)
 
+        # Memory budget for undoing bulk edits (Replace All, reload)
+        undo_history = self.parent.undo_history
+        undo_limit_layout = QHBoxLayout()
+        undo_limit_label = QLabel("Bulk undo memory limit (MB):")
+        self.undo_limit_spin = QSpinBox()
+        self.undo_limit_spin.setRange(0, 4096)
+        self.undo_limit_spin.setValue(undo_history.max_bytes // (1024 * 1024))
+        self.undo_limit_spin.valueChanged.connect(self.set_undo_limit)
+        undo_limit_layout.addWidget(undo_limit_label)
+        undo_limit_layout.addWidget(self.undo_limit_spin)
+
+        self.undo_usage_label = QLabel()
+        self.update_undo_usage()
+
+        layout.addLayout(undo_limit_layout)
+        layout.addWidget(self.undo_usage_label)
+
         close_button = QPushButton("Close")
         close_button.clicked.connect(self.close)
 
@@ -175,9 +240,864 @@ class PreferencesDialog(QDialog):
     def choose_bg_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
-            self.parent.setStyleSheet(
-                f"QMainWindow {{ background-color: {color.name()};}}"
-            )
+            self.parent.set_window_background(color)
+
+    def set_undo_limit(self, megabytes):
+        self.parent.undo_history.set_max_bytes(megabytes * 1024 * 1024)
+        self.update_undo_usage()
+
+    def update_undo_usage(self):
+        used, undo_steps, redo_steps, base = self.parent.undo_history.memory_usage()
+        self.undo_usage_label.setText(
+            f"Undo history: {(used + base) / 1024:.1f} KB ({undo_steps} undo, {redo_steps} redo steps, "
+            f"{base / 1024:.1f} KB of it a reference copy of the text)"
+        )
+
+
+#
+# OUTLINE: Incremental heading index
+#
+class OutlineIndex(QObject):
+    """
+    Heading index for a QTextDocument.
+
+    The index follows contentsChange notifications and only re-scans the
+    blocks touched by an edit (plus one neighbour on each side, since setext
+    headings span two lines). Edits that add or remove a code fence re-scan
+    from the edit to the end of the document.
+
+    The index also owns the heading ids. anchors() derives them from the
+    source titles with the toc extension's slugify, and OutlineExtension
+    writes them into the rendered headings and builds [TOC] from the index,
+    so the panel, the preview and the table of contents cannot disagree.
+    """
+    # row, number of headings removed there, number added
+    changed = pyqtSignal(int, int, int)
+
+    ATX_RE = re.compile(r"^(#{1,6})(.*?)#*\s*$")
+    SETEXT_RE = re.compile(r"^(=+|-+)[ ]*$")
+    FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+    ATTR_LIST_RE = re.compile(r"\s*\{[^}]*\}\s*$")
+    ATTR_ID_RE = re.compile(r"#([\w-]+)")
+    INLINE_LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+    NON_WORD_RE = re.compile(r"[\W_]+")
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.document = document
+        self.headings = []  # sorted [block_number, level, title]
+        self.fences = []  # sorted block numbers where fence state toggles
+        self.block_count = 0
+        self._anchors = None
+        # contentsChange is only emitted once the document has a layout
+        document.documentLayout()
+        document.contentsChange.connect(self.on_contents_change)
+        self.rebuild()
+
+    def rebuild(self):
+        removed = len(self.headings)
+        self.block_count = self.document.blockCount()
+        self.headings, self.fences, _ = self._scan(0, self.block_count - 1)
+        self._anchors = None
+        self.changed.emit(0, removed, len(self.headings))
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        old_count = self.block_count
+        new_count = self.document.blockCount()
+        delta = new_count - old_count
+
+        first = self.document.findBlock(position).blockNumber()
+        last_new = self.document.findBlock(position + chars_added).blockNumber()
+        if first < 0 or last_new < 0:
+            self.rebuild()
+            return
+        last_old = last_new - delta
+
+        start = max(first - 1, 0)
+        end_new = min(last_new + 1, new_count - 1)
+        end_old = last_old + 1
+
+        lo = bisect.bisect_left(self.fences, start)
+        hi = bisect.bisect_right(self.fences, end_old)
+        headings, fences, saw_fence = self._scan(start, end_new)
+        if hi > lo or saw_fence:
+            # Fence state below the edit may have flipped.
+            end_new = new_count - 1
+            end_old = old_count - 1
+            hi = len(self.fences)
+            headings, fences, _ = self._scan(start, end_new)
+
+        self.fences[lo:hi] = fences
+        for i in range(lo + len(fences), len(self.fences)):
+            self.fences[i] += delta
+
+        first_keys = [h[0] for h in self.headings]
+        lo = bisect.bisect_left(first_keys, start)
+        hi = bisect.bisect_right(first_keys, end_old)
+        old = self.headings[lo:hi]
+        self.headings[lo:hi] = headings
+        for heading in self.headings[lo + len(headings):]:
+            heading[0] += delta
+        self.block_count = new_count
+
+        # Only report rows whose level or title changed; moved blocks do not count.
+        same = min(len(old), len(headings))
+        prefix = 0
+        while prefix < same and old[prefix][1:] == headings[prefix][1:]:
+            prefix += 1
+        suffix = 0
+        while suffix < same - prefix and old[-1 - suffix][1:] == headings[-1 - suffix][1:]:
+            suffix += 1
+        if prefix + suffix < max(len(old), len(headings)):
+            self._anchors = None
+            self.changed.emit(lo + prefix, len(old) - prefix - suffix, len(headings) - prefix - suffix)
+
+    def _scan(self, start, end):
+        """
+        Scan blocks start..end (inclusive) of the current document.
+        Returns (headings, fence toggles, whether a fence-like line was seen).
+        """
+        headings = []
+        fences = []
+        saw_fence = False
+
+        # Recover the fence state from the unchanged toggles above the range.
+        open_fence = None
+        idx = bisect.bisect_left(self.fences, start) if start > 0 else 0
+        if idx % 2 == 1:
+            opener = self.document.findBlockByNumber(self.fences[idx - 1]).text()
+            match = self.FENCE_RE.match(opener)
+            open_fence = match.group(1) if match else "```"
+
+        block = self.document.findBlockByNumber(start)
+        prev_text = block.previous().text() if block.previous().isValid() else ""
+        number = start
+        while block.isValid() and number <= end:
+            text = block.text()
+            fence = self.FENCE_RE.match(text)
+            if fence:
+                saw_fence = True
+                marker = fence.group(1)
+                if open_fence is None:
+                    open_fence = marker
+                    fences.append(number)
+                elif marker[0] == open_fence[0] and len(marker) >= len(open_fence):
+                    open_fence = None
+                    fences.append(number)
+            elif open_fence is None:
+                heading = self._match_heading(prev_text, text, block.next())
+                if heading:
+                    headings.append([number] + heading)
+            prev_text = text
+            block = block.next()
+            number += 1
+        return headings, fences, saw_fence
+
+    def _match_heading(self, prev_text, text, next_block):
+        atx = self.ATX_RE.match(text)
+        if atx:
+            return [len(atx.group(1)), atx.group(2).strip()]
+        if not text.strip() or prev_text.strip() or self.FENCE_RE.match(text):
+            return None
+        if next_block.isValid():
+            underline = self.SETEXT_RE.match(next_block.text())
+            if underline:
+                level = 1 if underline.group(1)[0] == "=" else 2
+                return [level, text.strip()]
+        return None
+
+    def plain_title(self, title):
+        """Approximate the rendered text of a heading (used for slugs and display)."""
+        title = self.INLINE_LINK_RE.sub(r"\1", self.ATTR_LIST_RE.sub("", title))
+        title = title.replace("\\", "")
+        for marker in ("**", "~~", "`"):
+            title = title.replace(marker, "")
+        return title.strip("*").strip()
+
+    def match_key(self, text):
+        """Reduce a heading to letters and digits so source and rendered text compare equal."""
+        return self.NON_WORD_RE.sub("", self.plain_title(text)).lower()
+
+    def anchors(self):
+        """Heading ids in row order; an attribute list's {#id} wins over the slug."""
+        if self._anchors is None:
+            custom_ids = []
+            for _, _, title in self.headings:
+                attr = self.ATTR_LIST_RE.search(title)
+                custom = self.ATTR_ID_RE.search(attr.group(0)) if attr else None
+                custom_ids.append(custom.group(1) if custom else None)
+            used_ids = {custom_id for custom_id in custom_ids if custom_id}
+            self._anchors = [
+                custom_id or unique(slugify(self.plain_title(title), "-"), used_ids)
+                for (_, _, title), custom_id in zip(self.headings, custom_ids)
+            ]
+        return self._anchors
+
+
+class OutlineTreeprocessor(Treeprocessor):
+    """
+    Give the rendered headings their ids from the OutlineIndex and replace
+    the [TOC] marker with a table of contents built from the index.
+    """
+    def __init__(self, md, index):
+        super().__init__(md)
+        self.index = index
+
+    def run(self, root):
+        index = self.index
+        anchors = index.anchors()
+        keys = [(level, index.match_key(title)) for _, level, title in index.headings]
+        linked = [False] * len(keys)
+
+        # Top-level headings map onto the index in document order; one the index
+        # does not know (e.g. an image-only title) keeps the toc extension's id.
+        pos = 0
+        for el in root:
+            if not HEADING_TAG_RE.match(el.tag):
+                continue
+            key = (int(el.tag[1]), index.match_key("".join(el.itertext())))
+            try:
+                row = keys.index(key, pos)
+            except ValueError:
+                continue
+            el.set("id", anchors[row])
+            linked[row] = True
+            pos = row + 1
+
+        markers = [
+            (parent, i) for parent in root.iter() if parent.tag not in ("pre", "code")
+            for i, child in enumerate(parent)
+            if child.tag == "p" and len(child) == 0 and (child.text or "").strip() == TOC_MARKER
+        ]
+        for parent, i in markers:
+            parent[i] = self.toc_element(anchors, linked)
+
+    def toc_element(self, anchors, linked):
+        """The nested list the toc extension would produce, from the index."""
+        div = etree.Element("div", {"class": "toc"})
+        if not self.index.headings:
+            return div
+        stack = [[self.index.headings[0][1], etree.SubElement(div, "ul"), None]]  # level, ul, last li
+        for row, (_, level, title) in enumerate(self.index.headings):
+            while len(stack) > 1 and level < stack[-1][0]:
+                stack.pop()
+            top = stack[-1]
+            if level > top[0] and top[2] is not None:
+                sub = top[2].find("ul")
+                top = [level, sub if sub is not None else etree.SubElement(top[2], "ul"), None]
+                stack.append(top)
+            top[2] = li = etree.SubElement(top[1], "li")
+            if linked[row]:
+                link = etree.SubElement(li, "a", {"href": "#" + anchors[row]})
+                link.text = self.index.plain_title(title)
+            else:
+                li.text = self.index.plain_title(title)
+        return div
+
+
+class OutlineExtension(Extension):
+    def __init__(self, index, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+
+    def extendMarkdown(self, md):
+        # After attr_list (8) has applied {#id}, before toc (5) fills in the rest
+        md.treeprocessors.register(OutlineTreeprocessor(md, self.index), "outline", 6)
+
+
+#
+# UNDO: Bounded history for bulk edits
+#
+def apply_hunks(text, hunks):
+    """
+    Apply hunks to text. Each hunk is (start, old_segment, new_segment) with
+    start measured in text; hunks must be sorted and must not overlap.
+    """
+    parts = []
+    pos = 0
+    for start, old_segment, new_segment in hunks:
+        parts.append(text[pos:start])
+        parts.append(new_segment)
+        pos = start + len(old_segment)
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def invert_hunks(hunks):
+    """Return the hunks that turn the edited text back into the original."""
+    inverse = []
+    offset = 0
+    for start, old_segment, new_segment in hunks:
+        inverse.append((start + offset, new_segment, old_segment))
+        offset += len(new_segment) - len(old_segment)
+    return inverse
+
+
+def diff_texts(old_text, new_text):
+    """
+    Return a single hunk covering everything between the common prefix and
+    the common suffix of the two texts (or no hunks if they are equal).
+    Slices are compared in shrinking chunks so this stays linear on large files.
+    """
+    limit = min(len(old_text), len(new_text))
+    prefix = 0
+    step = 4096
+    while step:
+        while prefix + step <= limit and old_text[prefix:prefix + step] == new_text[prefix:prefix + step]:
+            prefix += step
+        step //= 2
+
+    limit -= prefix
+    suffix = 0
+    step = 4096
+    old_end = len(old_text)
+    new_end = len(new_text)
+    while step:
+        while (suffix + step <= limit and
+               old_text[old_end - suffix - step:old_end - suffix] == new_text[new_end - suffix - step:new_end - suffix]):
+            suffix += step
+        step //= 2
+
+    if prefix == old_end == new_end:
+        return []
+    return [(prefix, old_text[prefix:old_end - suffix], new_text[prefix:new_end - suffix])]
+
+
+class BulkUndoHistory:
+    """
+    Undo/redo for whole-buffer replacements (Replace All, reload from disk).
+
+    setPlainText clears the Qt undo stack, so these edits are tracked here as
+    lists of changed segments instead of full document copies. While any step
+    is recorded, the history also keeps the text it last set, and the ranges
+    touched by typing since then (from contentsChange); the next bulk edit
+    records that typing as a step of its own, one hunk per touched range.
+    The steps and that reference copy together are capped at max_bytes, and
+    the oldest steps are evicted first. Typing before the first bulk edit of
+    a document stays on Qt's own stack and is lost with it.
+    """
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+    def __init__(self, editor, max_bytes=DEFAULT_MAX_BYTES):
+        self.editor = editor
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()  # (hunks, hash before, hash after, size)
+        self.redo_stack = []
+        self.bytes_used = 0
+        # Text as last set through the history (None while there are no steps),
+        # and the ranges typed over since, as [start, end, length change] in
+        # current positions
+        self.base_text = None
+        self.typed = []
+        self.applying = False
+        editor.document().contentsChange.connect(self.on_contents_change)
+
+    def on_contents_change(self, position, chars_removed, chars_added):
+        if self.applying:
+            return
+        # Any edit not made by the history makes the redo steps unreachable
+        if self.redo_stack:
+            self._drop(self.redo_stack)
+        if self.base_text is not None:
+            self._track_typing(position, chars_removed, chars_added)
+
+    def apply(self, old_text, hunks, new_text=None):
+        """
+        Replace the editor text with old_text + hunks and record the step.
+        Returns False if nothing was changed.
+        """
+        if not hunks:
+            return False
+        if new_text is None:
+            new_text = apply_hunks(old_text, hunks)
+        size = self._size_of(hunks)
+        needed = size + sys.getsizeof(new_text)
+        if needed > self.max_bytes and not self._confirm_unrecorded(needed):
+            return False
+
+        if needed > self.max_bytes:
+            # Steps before this one could never be reached again
+            self.clear()
+        else:
+            self._record_typing(old_text)
+            self._push((hunks, hash(old_text), hash(new_text), size))
+        self._set_text(new_text, hunks[0][0])
+        return True
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack:
+            return False
+        text = self.editor.toPlainText()
+        self._record_typing(text)
+        if not self.undo_stack or hash(text) != self.undo_stack[-1][2]:
+            # The buffer does not match the recorded state; leave the history alone
+            return False
+        hunks = self.undo_stack[-1][0]
+        self.redo_stack.append(self.undo_stack.pop())
+        inverse = invert_hunks(hunks)
+        self._set_text(apply_hunks(text, inverse), inverse[0][0])
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        hunks, before, after, size = self.redo_stack[-1]
+        text = self.editor.toPlainText()
+        if hash(text) != before:
+            return False
+        self.undo_stack.append(self.redo_stack.pop())
+        self._set_text(apply_hunks(text, hunks), hunks[0][0])
+        return True
+
+    def reset(self):
+        """Forget every step, e.g. when another document is loaded."""
+        self.clear()
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.bytes_used = 0
+        self.base_text = None
+        self.typed = []
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def memory_usage(self):
+        """
+        Return (bytes used by steps, number of undo steps, number of redo
+        steps, bytes used by the reference copy of the text). The first and
+        last together count against max_bytes.
+        """
+        return self.bytes_used, len(self.undo_stack), len(self.redo_stack), self._base_size()
+
+    def _track_typing(self, position, chars_removed, chars_added):
+        """Merge an edit replacing chars_removed characters at position into self.typed."""
+        start = position
+        end = position + chars_removed
+        change = chars_added - chars_removed
+        delta = change
+        typed = []
+        for lo, hi, d in self.typed:
+            if hi < start:
+                typed.append([lo, hi, d])
+            elif lo > end:
+                typed.append([lo + change, hi + change, d])
+            else:
+                start = min(start, lo)
+                end = max(end, hi)
+                delta += d
+        typed.append([start, end + change, delta])
+        typed.sort()
+        self.typed = typed
+
+    def _typing_hunks(self, text):
+        """Hunks turning base_text into text, from the ranges tracked since."""
+        hunks = []
+        shift = 0  # length change of the ranges before this one
+        for lo, hi, delta in self.typed:
+            base_lo = lo - shift
+            base_hi = base_lo + (hi - lo) - delta
+            hunks.append((base_lo, self.base_text[base_lo:base_hi], text[lo:hi]))
+            shift += delta
+        hunks = [hunk for hunk in hunks if hunk[1] != hunk[2]]
+        if apply_hunks(self.base_text, hunks) != text:
+            # contentsChange can over- or under-report; fall back to a full diff
+            hunks = diff_texts(self.base_text, text)
+        return hunks
+
+    def _record_typing(self, text):
+        if self.base_text is None or not self.typed:
+            return
+        hunks = self._typing_hunks(text)
+        base_hash = hash(self.base_text)
+        self.typed = []
+        if hunks:
+            self.base_text = text
+            self._push((hunks, base_hash, hash(text), self._size_of(hunks)))
+
+    def _push(self, step):
+        self._drop(self.redo_stack)
+        self.undo_stack.append(step)
+        self.bytes_used += step[3]
+        self._evict()
+
+    def _confirm_unrecorded(self, size):
+        megabyte = 1024 * 1024
+        reply = QMessageBox.question(
+            self.editor,
+            "Undo Limit",
+            f"This change needs {size / megabyte:.1f} MB of undo history, more than the "
+            f"{self.max_bytes / megabyte:.0f} MB limit set in Preferences.\n"
+            f"It cannot be undone, and earlier undo steps will be discarded. Continue?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        return reply == QMessageBox.Yes
+
+    def _set_text(self, text, position):
+        self.applying = True
+        try:
+            self.editor.setPlainText(text)
+        finally:
+            self.applying = False
+        # setPlainText marks the document unmodified; a bulk edit is a change
+        self.editor.document().setModified(True)
+        self.typed = []
+        self.base_text = text if self.undo_stack or self.redo_stack else None
+        self._evict()
+        cursor = self.editor.textCursor()
+        cursor.setPosition(min(position, len(text)))
+        self.editor.setTextCursor(cursor)
+        self.editor.centerCursor()
+
+    def _drop(self, stack):
+        for step in stack:
+            self.bytes_used -= step[3]
+        stack.clear()
+
+    def _base_size(self):
+        return sys.getsizeof(self.base_text) if self.base_text is not None else 0
+
+    def _evict(self):
+        while self.bytes_used + self._base_size() > self.max_bytes and self.undo_stack:
+            self.bytes_used -= self.undo_stack.popleft()[3]
+        if self.bytes_used + self._base_size() > self.max_bytes:
+            self._drop(self.redo_stack)
+        if not self.undo_stack and not self.redo_stack:
+            # Nothing left to undo into; the reference copy is not needed
+            self.base_text = None
+            self.typed = []
+
+    @staticmethod
+    def _size_of(hunks):
+        # Segments are often shared (e.g. the same replacement text), count each once.
+        size = sys.getsizeof(hunks)
+        seen = set()
+        for hunk in hunks:
+            size += sys.getsizeof(hunk)
+            for segment in hunk[1:]:
+                if id(segment) not in seen:
+                    seen.add(id(segment))
+                    size += sys.getsizeof(segment)
+        return size
+
+
+#
+# LINKS: Local link and image validation
+#
+class LinkCollectorTreeprocessor(Treeprocessor):
+    """Record every link and image target while the document is rendered."""
+    def __init__(self, md, collector):
+        super().__init__(md)
+        self.collector = collector
+
+    def run(self, root):
+        targets = []
+        for el in root.iter():
+            if el.tag == "a" and el.get("href"):
+                targets.append(("link", el.get("href")))
+            elif el.tag == "img" and el.get("src"):
+                targets.append(("image", el.get("src")))
+        self.collector.targets = targets
+
+
+class LinkCollectorExtension(Extension):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.targets = []
+
+    def extendMarkdown(self, md):
+        # After the inline processor (20) has created the <a>/<img> elements
+        md.treeprocessors.register(LinkCollectorTreeprocessor(md, self), "link_collector", 1)
+
+
+def collect_link_targets(md_text):
+    """Render md_text off-screen and return its (kind, target) pairs."""
+    collector = LinkCollectorExtension()
+    markdown.markdown(md_text, extensions=MARKDOWN_EXTENSIONS + [collector])
+    return collector.targets
+
+
+def resolve_link_target(target, base_dir):
+    """
+    Map a link target to a local filesystem path, or None if it is external,
+    a pure #fragment, or relative to a document that has not been saved yet.
+    """
+    if WINDOWS_PATH_RE.match(target):
+        return target.split("#", 1)[0]
+    parts = urlsplit(target)
+    if parts.scheme == "file":
+        return url2pathname(parts.path)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if os.path.isabs(path):
+        return path
+    if base_dir is None:
+        return None
+    return os.path.normpath(os.path.join(base_dir, path))
+
+
+class StatCache:
+    """
+    Thread-safe cache of os.stat results (None for missing or invalid paths).
+    Entries are dropped by the file watcher when a file or directory changes,
+    and whenever their directory stops being watched.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def stat(self, path):
+        with self.lock:
+            if path in self.entries:
+                return self.entries[path]
+        try:
+            result = os.stat(path)
+        except (OSError, ValueError):  # ValueError: embedded NUL, e.g. from %00
+            result = None
+        with self.lock:
+            self.entries[path] = result
+        return result
+
+    def invalidate(self, path):
+        with self.lock:
+            self.entries.pop(path, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def invalidate_dir(self, dir_path):
+        """
+        Forget the directory and everything below it. A missing path is
+        watched through its nearest existing ancestor, so creating a
+        subdirectory there has to clear entries several levels down.
+        """
+        dir_path = os.path.normpath(dir_path)
+        prefix = os.path.join(dir_path, "")
+        with self.lock:
+            for path in [p for p in self.entries if p == dir_path or p.startswith(prefix)]:
+                del self.entries[path]
+
+    def existing_dir(self, path):
+        """Return the nearest ancestor directory of path that exists."""
+        dir_path = os.path.dirname(path)
+        while True:
+            result = self.stat(dir_path)
+            if result is not None and stat.S_ISDIR(result.st_mode):
+                return dir_path
+            parent = os.path.dirname(dir_path)
+            if parent == dir_path:
+                return dir_path
+            dir_path = parent
+
+
+class LinkValidator(QObject):
+    """
+    Checks local link and image targets on a thread pool.
+
+    Results arrive through the ``checked`` signal as (document path,
+    generation, [(kind, target, problem, watch directory), ...], watch
+    directories). A watch directory is the nearest existing directory of a
+    target. Every check reports back, but only results for which is_latest()
+    holds should be used. A check that fails is reported as a problem with
+    the document itself.
+    """
+    checked = pyqtSignal(str, int, list, list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.stat_cache = StatCache()
+        self.executor = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4))
+        self.generation_lock = threading.Lock()
+        self.generation_counter = itertools.count(1)
+        self.generations = {}
+
+    def validate_document(self, doc_path, targets):
+        """Check targets already collected from doc_path's latest render."""
+        self._submit(self._check, doc_path, targets, self._next_generation(doc_path))
+
+    def validate_file(self, doc_path):
+        """Read, render and check doc_path from disk."""
+        self._submit(self._check_file, doc_path)
+
+    def is_latest(self, doc_path, generation):
+        with self.generation_lock:
+            return self.generations.get(doc_path) == generation
+
+    def validate_workspace(self, root_dir):
+        """Render and check every Markdown file below root_dir, without cached results."""
+        self.stat_cache.clear()
+        self._submit(self._walk, root_dir)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _walk(self, root_dir):
+        for dir_path, dir_names, file_names in os.walk(root_dir):
+            dir_names[:] = [d for d in dir_names if not d.startswith(".")]
+            for name in file_names:
+                if name.lower().endswith((".md", ".markdown")):
+                    self._submit(self._check_file, os.path.join(dir_path, name))
+
+    def _submit(self, fn, *args):
+        self.executor.submit(fn, *args).add_done_callback(self._report_failure)
+
+    @staticmethod
+    def _report_failure(future):
+        # Report like an exception in a Qt slot instead of losing it in the future
+        if not future.cancelled() and future.exception() is not None:
+            error = future.exception()
+            sys.excepthook(type(error), error, error.__traceback__)
+
+    def _next_generation(self, doc_path):
+        with self.generation_lock:
+            generation = next(self.generation_counter)
+            self.generations[doc_path] = generation
+            return generation
+
+    def _check_file(self, doc_path):
+        generation = self._next_generation(doc_path)
+        try:
+            with open(doc_path, "r", encoding="utf-8") as f:
+                targets = collect_link_targets(f.read())
+        except Exception as e:
+            watch_dir = os.path.dirname(doc_path)
+            self.checked.emit(doc_path, generation, [("file", doc_path, str(e), watch_dir)], [watch_dir])
+            return
+        self._check(doc_path, targets, generation)
+
+    def _check(self, doc_path, targets, generation):
+        base_dir = os.path.dirname(doc_path) if doc_path else None
+        problems = []
+        directories = set()
+        try:
+            for kind, target in targets:
+                path = resolve_link_target(target, base_dir)
+                if path is None:
+                    continue
+                watch_dir = self.stat_cache.existing_dir(path)
+                directories.add(watch_dir)
+                result = self.stat_cache.stat(path)
+                if result is None:
+                    problems.append((kind, target, "not found", watch_dir))
+                elif kind == "image" and stat.S_ISDIR(result.st_mode):
+                    problems.append((kind, target, "is a directory", watch_dir))
+        except Exception as e:
+            # Still report, or the panel would keep showing the previous result
+            problems.append(("file", doc_path, f"check failed: {e}", base_dir or ""))
+            if base_dir:
+                directories.add(base_dir)
+        # The GUI also uses stale results, to drop their unwatched cache entries
+        self.checked.emit(doc_path, generation, problems, sorted(directories))
+
+
+#
+# THEMES: Compiled stylesheets and preview CSS
+#
+def parse_stylesheet(stylesheet):
+    """Split a Qt stylesheet into {selector: {property: value}}."""
+    rules = {}
+    for selectors, body in STYLESHEET_RULE_RE.findall(stylesheet):
+        declarations = {}
+        for declaration in body.split(";"):
+            if ":" in declaration:
+                name, value = declaration.split(":", 1)
+                declarations[name.strip()] = value.strip()
+        for selector in selectors.split(","):
+            rules.setdefault(selector.strip(), {}).update(declarations)
+    return rules
+
+
+def format_rule(selector, declarations):
+    body = " ".join(f"{name}: {value};" for name, value in declarations.items())
+    return f"{selector} {{ {body} }}"
+
+
+def code_stylesheets():
+    """
+    Return (preview CSS, export CSS) for highlighted code blocks. They are the
+    same for every theme, so a theme switch never changes the preview's CSS
+    and never has to re-lay out its document.
+    """
+    if HtmlFormatter is None:
+        return "", ""
+    formatter = HtmlFormatter(style=CODE_HIGHLIGHT_STYLE)
+    block = {"background-color": formatter.style.background_color, "color": CODE_TEXT_COLOR}
+    highlight_css = formatter.get_style_defs(".highlight")
+    export_css = "\n".join([format_rule(".highlight, .highlight pre", block), highlight_css])
+
+    # Every preview rule is matched against every element on each setHtml.
+    # Qt matches "span.k" cheaply but ".highlight .k" by walking the ancestors,
+    # which nearly doubled the cost of a render; the token spans only occur
+    # inside highlighted blocks anyway.
+    preview_rules = [format_rule("pre", block)]
+    for line in highlight_css.splitlines():
+        if line.startswith(".highlight ."):
+            preview_rules.append("span" + line[len(".highlight "):])
+    return export_css, "\n".join(preview_rules)
+
+
+def text_widget_style(declarations):
+    """
+    Turn a rule for a text widget into (QFont or None, {palette role: color}).
+    Applying colors through the palette only repaints the widget; a stylesheet
+    change re-polishes it, which re-lays out the whole preview document.
+    """
+    font = None
+    if "font-family" in declarations or "font-size" in declarations:
+        font = QFont(QApplication.font())
+        if "font-family" in declarations:
+            font.setFamilies([name.strip().strip("'\"") for name in declarations["font-family"].split(",")])
+        size = FONT_SIZE_RE.match(declarations.get("font-size", ""))
+        if size and size.group(2) == "px":
+            font.setPixelSize(round(float(size.group(1))))
+        elif size:
+            font.setPointSizeF(float(size.group(1)))
+    colors = {}
+    if "background-color" in declarations:
+        colors[QPalette.Base] = QColor(declarations["background-color"])
+    if "color" in declarations:
+        colors[QPalette.Text] = QColor(declarations["color"])
+    return font, colors
+
+
+class CompiledTheme:
+    """
+    A theme stylesheet parsed once and split into what each widget needs:
+    a background color for the main window, a font and palette colors for
+    the editor and the preview, and the CSS used in exported HTML.
+    """
+    def __init__(self, stylesheet, code_css):
+        rules = parse_stylesheet(stylesheet)
+
+        # The main window paints its own background (see
+        # MarkdownEditor.paintEvent) instead of taking a QMainWindow stylesheet,
+        # which re-polishes every child, or a palette, which propagates to them.
+        # Its "color" is dropped: the window draws no text of its own.
+        window = rules.get("QMainWindow", {})
+        self.window_background = QColor(window["background-color"]) if "background-color" in window else None
+
+        editor = rules.get("QPlainTextEdit", {})
+        preview = rules.get("QTextBrowser", {})
+        self.editor_font, self.editor_colors = text_widget_style(editor)
+        self.preview_font, self.preview_colors = text_widget_style(preview)
+
+        css_rules = [format_rule("body", {
+            name: value for name, value in preview.items() if name in ("background-color", "color")
+        })]
+        if "font-family" in preview:
+            css_rules.append(format_rule("pre, code", {"font-family": preview["font-family"]}))
+        css_rules.append(code_css)
+        self.export_css = "\n".join(css_rules)
 
 
 #
@@ -190,6 +1110,12 @@ class MarkdownEditor(QMainWindow):
         self.setMinimumSize(1200, 700)
 
         self.current_file = None
+        self.settings = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
+
+        # Session documents: path -> {"cursor": ..., "scroll": ...}, oldest first.
+        # Only metadata is kept; a file is read when it is first viewed.
+        self.session_documents = {}
+        self.pending_document = None
 
         # Themes
         self.themes = {
@@ -242,8 +1168,12 @@ class MarkdownEditor(QMainWindow):
                 }
             """,
         }
-        self.current_theme = "Light"
-        self.setStyleSheet(self.themes[self.current_theme])
+        self.export_code_css, self.preview_code_css = code_stylesheets()
+        self.compiled_themes = {}
+        self.window_background = None
+        self.current_theme = self.settings.value("theme", "Light")
+        if self.current_theme not in self.themes:
+            self.current_theme = "Light"
 
         # Keep track of last text for autosave
         self.last_text = ""
@@ -252,6 +1182,7 @@ class MarkdownEditor(QMainWindow):
         self.initUI()
         self.createMenus()
         self.createToolbars()
+        self.apply_theme(self.current_theme)
 
         # Context menu for text editor
         self.text_editor.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -260,6 +1191,7 @@ class MarkdownEditor(QMainWindow):
         # File watcher for external changes
         self.file_watcher = QFileSystemWatcher(self)
         self.file_watcher.fileChanged.connect(self.on_file_changed)
+        self.file_watcher.directoryChanged.connect(self.on_directory_changed)
 
         # Autosave timer
         self.autosave_timer = QTimer(self)
@@ -267,14 +1199,25 @@ class MarkdownEditor(QMainWindow):
         self.autosave_timer.timeout.connect(self.auto_save)
         self.autosave_timer.start()
 
+        self.restore_session()
+
     def initUI(self):
         # Left: Editor, Right: Preview
         self.text_editor = QPlainTextEdit()
         self.text_editor.setPlaceholderText("Write your Markdown here...")
         self.text_editor.textChanged.connect(self.on_text_changed)
+        try:
+            undo_limit = int(self.settings.value("undo/max_bytes", BulkUndoHistory.DEFAULT_MAX_BYTES))
+        except (TypeError, ValueError):
+            undo_limit = BulkUndoHistory.DEFAULT_MAX_BYTES
+        self.undo_history = BulkUndoHistory(self.text_editor, max(undo_limit, 0))
+        self.text_editor.installEventFilter(self)
 
         self.preview_browser = QTextBrowser()
         self.preview_browser.setOpenExternalLinks(True)
+        # Set once: the preview's colors and font come from its widget stylesheet
+        self.preview_browser.document().setDefaultStyleSheet(self.preview_code_css)
+        self.preview_html = ""
 
         splitter = QSplitter(self)
         splitter.addWidget(self.text_editor)
@@ -284,6 +1227,61 @@ class MarkdownEditor(QMainWindow):
 
         self.setCentralWidget(splitter)
 
+        # Outline: heading index kept in sync with the editor's document
+        self.outline = OutlineIndex(self.text_editor.document())
+        self.outline_extension = OutlineExtension(self.outline)
+        self.outline_list = QListWidget()
+        self.outline_list.itemClicked.connect(self.jump_to_heading)
+
+        self.outline_dock = QDockWidget("Outline", self)
+        self.outline_dock.setObjectName("OutlineDock")
+        self.outline_dock.setAutoFillBackground(True)  # keep the default look on any theme
+        self.outline_dock.setWidget(self.outline_list)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.outline_dock)
+
+        # Only the rows an edit changed are updated
+        self.outline.changed.connect(self.update_outline)
+        self.update_outline(0, 0, len(self.outline.headings))
+
+        # Link checking: targets are collected while rendering, stat'ed in the background
+        self.link_collector = LinkCollectorExtension()
+        self.link_validator = LinkValidator(self)
+        self.link_validator.checked.connect(self.on_links_checked)
+        self.link_problems = {}
+        self.last_link_check = None
+        # doc path -> (all watch dirs, watch dirs of its problems)
+        self.link_watches = {}
+        self.watched_dirs = set()
+
+        self.link_list = QListWidget()
+        self.link_list.itemClicked.connect(self.jump_to_link_problem)
+
+        self.link_dock = QDockWidget("Link Problems", self)
+        self.link_dock.setObjectName("LinkProblemsDock")
+        self.link_dock.setAutoFillBackground(True)  # keep the default look on any theme
+        self.link_dock.setWidget(self.link_list)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.link_dock)
+
+        self.link_check_timer = QTimer(self)
+        self.link_check_timer.setSingleShot(True)
+        self.link_check_timer.setInterval(500)
+        self.link_check_timer.timeout.connect(self.check_current_links)
+
+        self.link_panel_timer = QTimer(self)
+        self.link_panel_timer.setSingleShot(True)
+        self.link_panel_timer.setInterval(200)
+        self.link_panel_timer.timeout.connect(self.refresh_link_problems)
+
+        # Documents from this and previous sessions
+        self.session_list = QListWidget()
+        self.session_list.itemClicked.connect(self.activate_session_document)
+
+        self.session_dock = QDockWidget("Documents", self)
+        self.session_dock.setObjectName("DocumentsDock")
+        self.session_dock.setAutoFillBackground(True)  # keep the default look on any theme
+        self.session_dock.setWidget(self.session_list)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.session_dock)
+
     def createMenus(self):
         menu_bar = QMenuBar(self)
         self.setMenuBar(menu_bar)
@@ -307,12 +1305,20 @@ class MarkdownEditor(QMainWindow):
         save_as_action.triggered.connect(self.save_file_as)
         file_menu.addAction(save_as_action)
 
+        close_document_action = QAction("Close", self)
+        close_document_action.triggered.connect(self.close_document)
+        file_menu.addAction(close_document_action)
+
         file_menu.addSeparator()
 
         import_image_action = QAction("Import Image...", self)
         import_image_action.triggered.connect(self.import_image)
         file_menu.addAction(import_image_action)
 
+        check_links_action = QAction("Check Links in Folder...", self)
+        check_links_action.triggered.connect(self.check_workspace_links)
+        file_menu.addAction(check_links_action)
+
         file_menu.addSeparator()
 
         export_html_action = QAction("Export to HTML", self)
@@ -332,6 +1338,16 @@ class MarkdownEditor(QMainWindow):
         # ---------- EDIT MENU ----------
         edit_menu = menu_bar.addMenu("Edit")
 
+        undo_action = QAction("Undo", self)
+        undo_action.triggered.connect(self.undo)
+        edit_menu.addAction(undo_action)
+
+        redo_action = QAction("Redo", self)
+        redo_action.triggered.connect(self.redo)
+        edit_menu.addAction(redo_action)
+
+        edit_menu.addSeparator()
+
         find_replace_action = QAction("Find & Replace", self)
         find_replace_action.triggered.connect(self.open_find_replace)
         edit_menu.addAction(find_replace_action)
@@ -404,6 +1420,10 @@ class MarkdownEditor(QMainWindow):
         preferences_action.triggered.connect(self.open_preferences)
         view_menu.addAction(preferences_action)
 
+        view_menu.addAction(self.outline_dock.toggleViewAction())
+        view_menu.addAction(self.link_dock.toggleViewAction())
+        view_menu.addAction(self.session_dock.toggleViewAction())
+
         theme_submenu = view_menu.addMenu("Switch Theme")
         for theme_name in self.themes.keys():
             theme_action = QAction(theme_name, self)
@@ -562,10 +1582,42 @@ class MarkdownEditor(QMainWindow):
     # FILE OPERATIONS
     #
     def new_file(self):
+        if not self.maybe_save():
+            return False
+        self.remember_position()
         self.remove_file_watcher()
         self.current_file = None
+        self.undo_history.reset()
         self.text_editor.clear()
+        self.text_editor.document().setModified(False)
         self.setWindowTitle("Fancy Markdown Editor - Untitled")
+        self.refresh_session_list()
+        return True
+
+    def close_document(self):
+        """Close the current document and drop it from the session."""
+        path = self.current_file
+        if self.new_file():
+            self.session_documents.pop(path, None)
+            self.refresh_session_list()
+
+    def maybe_save(self):
+        """
+        Offer to save unsaved changes before the buffer is replaced.
+        Returns False if the user cancelled or saving failed.
+        """
+        if not self.text_editor.document().isModified():
+            return True
+        name = os.path.basename(self.current_file) if self.current_file else "Untitled"
+        reply = QMessageBox.question(
+            self,
+            "Unsaved Changes",
+            f"'{name}' has unsaved changes.\nSave them first?",
+            QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel
+        )
+        if reply == QMessageBox.Save:
+            return self.save_file()
+        return reply == QMessageBox.Discard
 
     def open_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -578,22 +1630,40 @@ class MarkdownEditor(QMainWindow):
             self.load_file(file_path)
 
     def load_file(self, file_path):
+        switching = file_path != self.current_file
+        if switching:
+            if not self.maybe_save():
+                return False
+            self.remember_position()
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 content = f.read()
-            self.text_editor.setPlainText(content)
+            if not switching:
+                # Reload: keep the change undoable without storing a full copy
+                old_text = self.text_editor.toPlainText()
+                hunks = diff_texts(old_text, content)
+                if hunks and not self.undo_history.apply(old_text, hunks, content):
+                    return False
+            else:
+                self.undo_history.reset()
+                self.text_editor.setPlainText(content)
+            self.text_editor.document().setModified(False)
             self.current_file = file_path
             self.setWindowTitle(f"Fancy Markdown Editor - {os.path.basename(file_path)}")
             self.update_preview()
             self.add_file_watcher(file_path)
+            if switching:
+                self.add_session_document(file_path)
+                self.restore_position(file_path)
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Open Error", str(e))
+            return False
 
     def save_file(self):
         if self.current_file is None:
-            self.save_file_as()
-        else:
-            self.write_to_file(self.current_file)
+            return self.save_file_as()
+        return self.write_to_file(self.current_file)
 
     def save_file_as(self):
         file_path, _ = QFileDialog.getSaveFileName(
@@ -603,17 +1673,133 @@ class MarkdownEditor(QMainWindow):
             "Markdown Files (*.md *.markdown);;All Files (*)"
         )
         if file_path:
-            self.write_to_file(file_path)
+            return self.write_to_file(file_path)
+        return False
 
     def write_to_file(self, file_path):
         try:
             with open(file_path, "w", encoding="utf-8") as f:
                 f.write(self.text_editor.toPlainText())
+            self.text_editor.document().setModified(False)
             self.current_file = file_path
             self.setWindowTitle(f"Fancy Markdown Editor - {os.path.basename(file_path)}")
             self.add_file_watcher(file_path)
+            self.add_session_document(file_path)
+            return True
         except Exception as e:
             QMessageBox.critical(self, "Save Error", str(e))
+            return False
+
+    #
+    # SESSION
+    #
+    def restore_session(self):
+        """
+        Bring back the previous session's document list, positions and window
+        layout. No document is read here: the active one is loaded once the
+        event loop is running, the others when they are first selected.
+        """
+        geometry = self.settings.value("window/geometry")
+        if geometry:
+            self.restoreGeometry(geometry)
+        state = self.settings.value("window/state")
+        if state:
+            self.restoreState(state)
+
+        def position(value):
+            # A hand-edited or corrupted entry starts at the top instead of failing the load
+            return value if isinstance(value, int) and not isinstance(value, bool) and value >= 0 else 0
+
+        try:
+            documents = json.loads(self.settings.value("session/documents", "[]"))
+        except (ValueError, TypeError):
+            documents = []  # unreadable session, start fresh
+        for doc in documents if isinstance(documents, list) else []:
+            if isinstance(doc, dict) and isinstance(doc.get("path"), str):
+                self.session_documents[doc["path"]] = {
+                    "cursor": position(doc.get("cursor")),
+                    "scroll": position(doc.get("scroll")),
+                }
+
+        current = self.settings.value("session/current", "")
+        if current in self.session_documents:
+            self.pending_document = current
+            self.setWindowTitle(f"Fancy Markdown Editor - {os.path.basename(current)}")
+            QTimer.singleShot(0, self.open_pending_document)
+        self.refresh_session_list()
+
+    def save_session(self):
+        self.remember_position()
+        documents = [dict(path=path, **entry) for path, entry in self.session_documents.items()]
+        self.settings.setValue("session/documents", json.dumps(documents))
+        self.settings.setValue("session/current", self.current_file or self.pending_document or "")
+        self.settings.setValue("theme", self.current_theme)
+        self.settings.setValue("undo/max_bytes", self.undo_history.max_bytes)
+        self.settings.setValue("window/geometry", self.saveGeometry())
+        self.settings.setValue("window/state", self.saveState())
+
+    def open_pending_document(self):
+        path, self.pending_document = self.pending_document, None
+        if path is None or path == self.current_file:
+            return
+        if os.path.isfile(path):
+            self.load_file(path)
+        else:
+            # Gone since the last session: drop it quietly
+            self.session_documents.pop(path, None)
+            self.setWindowTitle("Fancy Markdown Editor - Untitled")
+            self.refresh_session_list()
+
+    def activate_session_document(self, item):
+        path = item.data(Qt.UserRole)
+        if path == self.current_file:
+            return
+        if not os.path.isfile(path):
+            QMessageBox.warning(self, "Open Error", f"'{path}' no longer exists.")
+            self.session_documents.pop(path, None)
+            self.refresh_session_list()
+            return
+        self.pending_document = None
+        if not self.load_file(path):
+            self.refresh_session_list()
+
+    def add_session_document(self, path):
+        """Mark path as the most recently used document, evicting the least recent."""
+        entry = self.session_documents.pop(path, None) or {"cursor": 0, "scroll": 0}
+        self.session_documents[path] = entry
+        for old_path in list(self.session_documents):
+            if len(self.session_documents) <= MAX_SESSION_DOCUMENTS:
+                break
+            if old_path not in (path, self.current_file):
+                del self.session_documents[old_path]
+        self.refresh_session_list()
+
+    def remember_position(self):
+        entry = self.session_documents.get(self.current_file)
+        if entry is not None:
+            entry["cursor"] = self.text_editor.textCursor().position()
+            entry["scroll"] = self.text_editor.verticalScrollBar().value()
+
+    def restore_position(self, path):
+        entry = self.session_documents.get(path)
+        if entry is None:
+            return
+        cursor = self.text_editor.textCursor()
+        cursor.setPosition(min(entry["cursor"], self.text_editor.document().characterCount() - 1))
+        self.text_editor.setTextCursor(cursor)
+        # The scroll range is only final after the editor has laid out the new text
+        scroll = entry["scroll"]
+        QTimer.singleShot(0, lambda: self.text_editor.verticalScrollBar().setValue(scroll))
+
+    def refresh_session_list(self):
+        self.session_list.clear()
+        for path in self.session_documents:
+            item = QListWidgetItem(os.path.basename(path))
+            item.setToolTip(path)
+            item.setData(Qt.UserRole, path)
+            self.session_list.addItem(item)
+            if path == (self.current_file or self.pending_document):
+                self.session_list.setCurrentItem(item)
 
     #
     # IMAGE IMPORT
@@ -635,10 +1821,7 @@ class MarkdownEditor(QMainWindow):
     #
     def export_to_html(self):
         md_text = self.text_editor.toPlainText()
-        html_content = markdown.markdown(
-            md_text,
-            extensions=["extra", "toc", "tables", "pymdownx.highlight", "pymdownx.extra", "pymdownx.superfences"]
-        )
+        html_content = self.render_markdown(md_text)
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             "Export to HTML",
@@ -648,7 +1831,7 @@ class MarkdownEditor(QMainWindow):
         if file_path:
             try:
                 with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(html_content)
+                    f.write(self.html_document(html_content))
                 QMessageBox.information(self, "Export to HTML", f"Exported to {file_path} successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Export Error", str(e))
@@ -658,10 +1841,7 @@ class MarkdownEditor(QMainWindow):
     #
     def export_to_pdf(self):
         md_text = self.text_editor.toPlainText()
-        html_content = markdown.markdown(
-            md_text,
-            extensions=["extra", "toc", "tables", "pymdownx.highlight", "pymdownx.extra", "pymdownx.superfences"]
-        )
+        html_content = self.render_markdown(md_text)
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             "Export to PDF",
@@ -670,11 +1850,21 @@ class MarkdownEditor(QMainWindow):
         )
         if file_path:
             try:
-                pdfkit.from_string(html_content, file_path)
+                pdfkit.from_string(self.html_document(html_content), file_path)
                 QMessageBox.information(self, "Export to PDF", f"Exported to {file_path} successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Export Error", str(e))
 
+    def html_document(self, html_content):
+        """Wrap rendered Markdown in a standalone page carrying the theme CSS."""
+        title = html.escape(os.path.basename(self.current_file or "Untitled"))
+        css = self.compiled_theme(self.current_theme).export_css
+        return (
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>{title}</title>\n<style>\n{css}\n</style>\n</head>\n"
+            f"<body>\n{html_content}\n</body>\n</html>\n"
+        )
+
     #
     # AUTOSAVE
     #
@@ -717,6 +1907,7 @@ class MarkdownEditor(QMainWindow):
         """
         Prompt user if they want to reload the file because of external changes.
         """
+        self.link_validator.stat_cache.invalidate(path)
         if not os.path.isfile(path):
             return  # file might have been deleted or moved
         reply = QMessageBox.question(
@@ -729,22 +1920,173 @@ class MarkdownEditor(QMainWindow):
         if reply == QMessageBox.Yes:
             self.load_file(path)
 
+    def on_directory_changed(self, path):
+        # Something was added, removed or renamed next to a linked file
+        self.link_validator.stat_cache.invalidate_dir(path)
+        self.last_link_check = None
+        self.link_check_timer.start()
+
+        current = self.current_file or ""
+        for doc_path, (_, problem_dirs) in list(self.link_watches.items()):
+            if doc_path and doc_path != current and path in problem_dirs:
+                self.link_validator.validate_file(doc_path)
+
     #
     # LIVE PREVIEW
     #
     def update_preview(self):
         md_text = self.text_editor.toPlainText()
-        html_content = markdown.markdown(
+        html_content = self.render_markdown(md_text)
+        self.preview_html = html_content
+        self.preview_browser.setHtml(html_content)
+        if (self.current_file, self.link_collector.targets) != self.last_link_check:
+            self.link_check_timer.start()
+
+    def render_markdown(self, md_text):
+        return markdown.markdown(
             md_text,
-            extensions=["extra", "toc", "tables", "pymdownx.highlight", "pymdownx.extra", "pymdownx.superfences"]
+            extensions=MARKDOWN_EXTENSIONS + [self.link_collector, self.outline_extension],
+            extension_configs=MARKDOWN_EXTENSION_CONFIGS
         )
-        self.preview_browser.setHtml(html_content)
+
+    #
+    # OUTLINE
+    #
+    def update_outline(self, row, removed, added):
+        """Replace the panel rows an edit changed; rows map 1:1 to outline.headings."""
+        if removed == self.outline_list.count():
+            self.outline_list.clear()
+        else:
+            for _ in range(removed):
+                self.outline_list.takeItem(row)
+        for i, (_, level, title) in enumerate(self.outline.headings[row:row + added]):
+            title = self.outline.plain_title(title) or "(untitled)"
+            self.outline_list.insertItem(row + i, "    " * (level - 1) + title)
+
+    def jump_to_heading(self, item):
+        """Move the editor cursor to the heading and scroll the preview to its anchor."""
+        row = self.outline_list.row(item)
+        block = self.text_editor.document().findBlockByNumber(self.outline.headings[row][0])
+        if block.isValid():
+            self.text_editor.setTextCursor(QTextCursor(block))
+            self.text_editor.centerCursor()
+            self.text_editor.setFocus()
+        self.preview_browser.scrollToAnchor(self.outline.anchors()[row])
+
+    #
+    # LINK CHECKING
+    #
+    def check_current_links(self):
+        self.last_link_check = (self.current_file, self.link_collector.targets)
+        self.link_validator.validate_document(self.current_file or "", self.link_collector.targets)
+        self.sync_link_watches()
+
+    def check_workspace_links(self):
+        dir_path = QFileDialog.getExistingDirectory(self, "Check Links in Folder")
+        if dir_path:
+            self.link_dock.show()
+            self.link_validator.validate_workspace(dir_path)
+
+    def on_links_checked(self, doc_path, generation, problems, directories):
+        if not self.link_validator.is_latest(doc_path, generation):
+            # A newer check of this document is already queued
+            self.forget_unwatched(directories)
+            return
+        if problems:
+            self.link_problems[doc_path] = problems
+        else:
+            self.link_problems.pop(doc_path, None)
+
+        if problems or doc_path == (self.current_file or ""):
+            self.link_watches[doc_path] = (set(directories), {p[3] for p in problems if p[3]})
+        else:
+            self.link_watches.pop(doc_path, None)
+        self.sync_link_watches()
+        self.forget_unwatched(directories)
+        self.link_panel_timer.start()
+
+    def sync_link_watches(self):
+        """
+        Watch every directory the current document links into, but only the
+        directories of reported problems for other documents, so checking a
+        large tree does not use up the system's file watches. A document
+        elsewhere that breaks later is only noticed by checking it again, so
+        cached results are dropped for every directory that is not watched.
+        """
+        current = self.current_file or ""
+        wanted = set()
+        for doc_path, (all_dirs, problem_dirs) in self.link_watches.items():
+            wanted.update(all_dirs if doc_path == current else problem_dirs)
+        stale = self.watched_dirs - wanted
+        new = wanted - self.watched_dirs
+        if stale:
+            self.file_watcher.removePaths(list(stale))
+        if new:
+            self.file_watcher.addPaths(list(new))
+        self.watched_dirs = wanted
+        self.forget_unwatched(stale)
+
+    def forget_unwatched(self, directories):
+        """Drop cached stat results below directories no watch would invalidate."""
+        for dir_path in directories:
+            if dir_path not in self.watched_dirs:
+                self.link_validator.stat_cache.invalidate_dir(dir_path)
+
+    def refresh_link_problems(self):
+        self.link_list.clear()
+        for doc_path in sorted(self.link_problems):
+            doc_name = os.path.basename(doc_path) or "Untitled"
+            for kind, target, problem, _ in self.link_problems[doc_path]:
+                item = QListWidgetItem(f"{doc_name}: {kind} '{target}' {problem}")
+                item.setToolTip(doc_path)
+                item.setData(Qt.UserRole, doc_path)
+                item.setData(Qt.UserRole + 1, target)
+                self.link_list.addItem(item)
+
+    def jump_to_link_problem(self, item):
+        doc_path = item.data(Qt.UserRole)
+        if doc_path and doc_path != self.current_file and not self.load_file(doc_path):
+            return
+        self.text_editor.moveCursor(QTextCursor.Start)
+        if self.text_editor.find(item.data(Qt.UserRole + 1)):
+            self.text_editor.centerCursor()
+            self.text_editor.setFocus()
+
+    #
+    # UNDO / REDO
+    #
+    def undo(self):
+        """Undo typing via Qt first, then fall back to the bulk edit history."""
+        if self.text_editor.document().isUndoAvailable():
+            self.text_editor.undo()
+        else:
+            self.undo_history.undo()
+
+    def redo(self):
+        if self.text_editor.document().isRedoAvailable():
+            self.text_editor.redo()
+        else:
+            self.undo_history.redo()
+
+    def eventFilter(self, obj, event):
+        # Route Ctrl+Z / Ctrl+Y to the bulk history once Qt's own stack is empty
+        if obj is self.text_editor and event.type() == QEvent.KeyPress:
+            document = self.text_editor.document()
+            if event.matches(QKeySequence.Undo) and not document.isUndoAvailable():
+                if self.undo_history.can_undo():
+                    self.undo_history.undo()
+                    return True
+            elif event.matches(QKeySequence.Redo) and not document.isRedoAvailable():
+                if self.undo_history.can_redo():
+                    self.undo_history.redo()
+                    return True
+        return super().eventFilter(obj, event)
 
     #
     # FIND & REPLACE
     #
     def open_find_replace(self):
-        dialog = FindReplaceDialog(self.text_editor)
+        dialog = FindReplaceDialog(self.text_editor, self.undo_history)
         dialog.exec_()
 
     #
@@ -758,9 +2100,58 @@ class MarkdownEditor(QMainWindow):
     # THEME SWITCH
     #
     def switch_theme(self, theme_name):
-        if theme_name in self.themes:
-            self.setStyleSheet(self.themes[theme_name])
-            self.current_theme = theme_name
+        if theme_name in self.themes and theme_name != self.current_theme:
+            self.apply_theme(theme_name)
+
+    def compiled_theme(self, theme_name):
+        theme = self.compiled_themes.get(theme_name)
+        if theme is None:
+            theme = CompiledTheme(self.themes[theme_name], self.export_code_css)
+            self.compiled_themes[theme_name] = theme
+        return theme
+
+    def apply_theme(self, theme_name):
+        """
+        Apply a theme touching only the widgets whose style changes: the main
+        window background and the editor's and preview's colors, plus their
+        font if it differs. The preview's document keeps its HTML and CSS, so
+        unless the font changes nothing is re-rendered or re-laid out.
+        """
+        theme = self.compiled_theme(theme_name)
+        self.current_theme = theme_name
+        self.set_window_background(theme.window_background)
+        self.style_text_widget(self.text_editor, theme.editor_font, theme.editor_colors)
+        self.style_text_widget(self.preview_browser, theme.preview_font, theme.preview_colors)
+
+    def style_text_widget(self, widget, font, colors):
+        font = font or QApplication.font(widget)
+        if widget.font() != font:
+            widget.setFont(font)
+        # Start from the default palette so roles a theme leaves out are reset
+        palette = QApplication.palette(widget)
+        for role, color in colors.items():
+            palette.setColor(role, color)
+        if widget.palette() != palette:
+            widget.setPalette(palette)
+
+    def set_window_background(self, color):
+        self.window_background = color
+        self.update()
+
+    def paintEvent(self, event):
+        if self.window_background is not None:
+            painter = QPainter(self)
+            painter.fillRect(event.rect(), self.window_background)
+            painter.end()
+        super().paintEvent(event)
+
+    def closeEvent(self, event):
+        if not self.maybe_save():
+            event.ignore()
+            return
+        self.save_session()
+        self.link_validator.shutdown()
+        super().closeEvent(event)
 
 
 def main():
@@ -0,0 +1,136 @@
+"""
+Time MarkdownEditor.switch_theme with a large document open.
+
+Run it against any checkout to compare revisions, e.g.:
+
+    git worktree add /tmp/ohpymark-base <commit>
+    QT_QPA_PLATFORM=offscreen python benchmarks/theme_switch.py --repo /tmp/ohpymark-base
+    QT_QPA_PLATFORM=offscreen python benchmarks/theme_switch.py
+
+Each "switch" sample is one switch_theme call plus everything it leads to
+until the window shows the new theme: the events it posts (polish, layout,
+repaint) and any deferred work still pending 300 ms later (checked with a
+timer, e.g. a debounced preview re-layout). "render" is one full
+update_preview, as done on every keystroke.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+CHUNK = """# Section {n}
+
+Some *emphasis*, **bold** text and `inline code` with a [link](other.md#part).
+
+## Details {n}
+
+- item one
+- item two with ![image](img/figure{n}.png)
+
+```python
+def function_{n}(value):
+    return value * {n}
+```
+
+| Column | Value |
+|--------|-------|
+| a      | {n}   |
+
+"""
+
+
+def build_document(size_bytes):
+    parts = []
+    total = 0
+    n = 0
+    while total < size_bytes:
+        chunk = CHUNK.format(n=n)
+        parts.append(chunk)
+        total += len(chunk)
+        n += 1
+    return "".join(parts)
+
+
+def report(label, samples):
+    print(f"{label + ':':<10} median {statistics.median(samples):.1f} ms, "
+          f"mean {statistics.mean(samples):.1f} ms, "
+          f"min {min(samples):.1f} ms, max {max(samples):.1f} ms ({len(samples)} samples)")
+
+
+def time_switch(app, editor, theme_name, settle_ms=300):
+    """
+    Time one switch end to end. Deferred work fires from timers, so keep
+    processing events until settle_ms pass without any noticeable work, and
+    count the time until the last such work finished.
+    """
+    start = time.perf_counter()
+    editor.switch_theme(theme_name)
+    app.processEvents()
+    done = time.perf_counter()
+    while (time.perf_counter() - done) * 1000 < settle_ms:
+        before = time.perf_counter()
+        app.processEvents()
+        if time.perf_counter() - before > 0.005:
+            done = time.perf_counter()
+        time.sleep(0.001)
+    return (done - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repo", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="checkout containing OhPyMark.py (default: this one)")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="document size in MB")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over all themes")
+    args = parser.parse_args()
+
+    # Keep the user's settings (and any saved session) out of the measurement
+    os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp(prefix="ohpymark-bench-")
+    sys.path.insert(0, args.repo)
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    import OhPyMark
+
+    editor = OhPyMark.MarkdownEditor()
+    editor.resize(1200, 700)
+    editor.show()
+
+    text = build_document(int(args.size_mb * 1024 * 1024))
+    start = time.perf_counter()
+    editor.text_editor.setPlainText(text)
+    app.processEvents()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    # Let deferred work (outline refresh, link checks) finish before timing
+    settle_until = time.perf_counter() + 2
+    while time.perf_counter() < settle_until:
+        app.processEvents()
+        time.sleep(0.01)
+
+    themes = list(editor.themes)
+    switches = []
+    for _ in range(args.rounds):
+        for theme_name in themes[1:] + themes[:1]:
+            switches.append(time_switch(app, editor, theme_name))
+
+    renders = []
+    for _ in range(3):
+        start = time.perf_counter()
+        editor.update_preview()
+        app.processEvents()
+        renders.append((time.perf_counter() - start) * 1000)
+
+    print(f"repo:      {os.path.abspath(args.repo)}")
+    print(f"document:  {len(text) / (1024 * 1024):.1f} MB, loaded in {load_ms:.0f} ms")
+    report("switch", switches)
+    report("render", renders)
+
+    if hasattr(editor, "link_validator"):
+        editor.link_validator.shutdown()
+
+
+if __name__ == "__main__":
+    main()
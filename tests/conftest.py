@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# QSettings resolves its directory once per process; keep the user's settings out of the tests
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp(prefix="ohpymark-tests-")
+
+
+@pytest.fixture
+def make_window():
+    """Build MarkdownEditor windows on a fresh set of settings; all are torn down afterwards."""
+    pytest.importorskip("PyQt5")
+    from PyQt5.QtCore import QSettings
+    from PyQt5.QtWidgets import QApplication
+    import OhPyMark
+
+    app = QApplication.instance() or QApplication([])
+    QSettings(OhPyMark.SETTINGS_ORGANIZATION, OhPyMark.SETTINGS_APPLICATION).clear()
+    windows = []
+
+    def make():
+        window = OhPyMark.MarkdownEditor()
+        windows.append(window)
+        return window
+
+    yield make
+    for window in windows:
+        window.text_editor.document().setModified(False)
+        window.link_validator.shutdown()
+        window.deleteLater()
+    app.processEvents()
+    QSettings(OhPyMark.SETTINGS_ORGANIZATION, OhPyMark.SETTINGS_APPLICATION).clear()
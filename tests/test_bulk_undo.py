@@ -0,0 +1,175 @@
+import random
+import sys
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtTest import QTest
+from PyQt5.QtWidgets import QApplication, QMessageBox, QPlainTextEdit
+
+from OhPyMark import BulkUndoHistory, FindReplaceDialog, apply_hunks, diff_texts, invert_hunks
+
+
+@pytest.fixture
+def window(make_window, monkeypatch):
+    monkeypatch.setattr(QMessageBox, "information", lambda *args: QMessageBox.Ok)
+    window = make_window()
+    window.text_editor.setPlainText("foo bar foo")
+    return window
+
+
+@pytest.fixture
+def editor():
+    app = QApplication.instance() or QApplication([])
+    editor = QPlainTextEdit()
+    yield editor
+    editor.deleteLater()
+    app.processEvents()
+
+
+def replace_all(window, find, replace):
+    dialog = FindReplaceDialog(window.text_editor, window.undo_history)
+    dialog.find_input.setText(find)
+    dialog.replace_input.setText(replace)
+    dialog.case_checkbox.setChecked(True)
+    dialog.replace_all()
+
+
+def type_at(editor, position, text):
+    cursor = QTextCursor(editor.document())
+    cursor.setPosition(position)
+    cursor.insertText(text)
+
+
+def test_typing_between_bulk_edits_is_kept(window):
+    replace_all(window, "foo", "X")
+    window.text_editor.moveCursor(QTextCursor.End)
+    QTest.keyClicks(window.text_editor, "x")
+    replace_all(window, "X", "Y")
+    assert window.text_editor.toPlainText() == "Y bar Yx"
+
+    window.undo()
+    assert window.text_editor.toPlainText() == "X bar Xx"
+    window.undo()
+    assert window.text_editor.toPlainText() == "X bar X"
+    window.undo()
+    assert window.text_editor.toPlainText() == "foo bar foo"
+
+    window.redo()
+    window.redo()
+    window.redo()
+    assert window.text_editor.toPlainText() == "Y bar Yx"
+
+
+def test_typing_after_undo_drops_only_redo(window):
+    replace_all(window, "foo", "X")
+    replace_all(window, "bar", "Z")
+    window.undo()
+    QTest.keyClicks(window.text_editor, "!")
+    assert not window.undo_history.can_redo()
+
+    # Undo the typing through Qt, then the remaining bulk step is still there
+    window.undo()
+    assert window.text_editor.toPlainText() == "X bar X"
+    window.undo()
+    assert window.text_editor.toPlainText() == "foo bar foo"
+
+
+def test_typing_at_both_ends_is_recorded_compactly(editor):
+    text = "a" * 200_000 + "b"
+    editor.setPlainText(text)
+    history = BulkUndoHistory(editor)
+    history.apply(text, [(len(text) - 1, "b", "c")])
+
+    type_at(editor, 0, "start ")
+    type_at(editor, editor.document().characterCount() - 1, " end")
+    edited = editor.toPlainText()
+    history.apply(edited, [(0, "s", "S")])
+
+    hunks = history.undo_stack[-2][0]
+    assert hunks == [(0, "", "start "), (len(text), "", " end")]
+    assert history.undo_stack[-2][3] < 1024
+
+    assert history.undo() and history.undo()
+    assert editor.toPlainText() == text[:-1] + "c"
+
+
+def test_steps_and_reference_copy_share_the_cap(editor):
+    text = "x" * 1000
+    editor.setPlainText(text)
+    history = BulkUndoHistory(editor, max_bytes=10 ** 9)
+    steps = []
+    for i in range(5):
+        hunks = [(i * 100, "x" * 100, "y" * 100)]
+        steps.append(hunks)
+        history.apply(editor.toPlainText(), hunks)
+    sizes = [BulkUndoHistory._size_of(hunks) for hunks in steps]
+
+    used, undo_steps, redo_steps, base = history.memory_usage()
+    assert (used, undo_steps, redo_steps) == (sum(sizes), 5, 0)
+    assert base == sys.getsizeof(editor.toPlainText())
+
+    # Room for the copy and the three newest steps: the two oldest go
+    history.set_max_bytes(base + sum(sizes[2:]))
+    assert history.memory_usage() == (sum(sizes[2:]), 3, 0, base)
+    assert [step[0] for step in history.undo_stack] == steps[2:]
+
+    assert history.undo() and history.undo() and history.undo()
+    assert not history.undo()
+    assert editor.toPlainText() == "y" * 200 + "x" * 800
+
+    # Without room for the copy nothing can be kept
+    history.set_max_bytes(base - 1)
+    assert history.memory_usage() == (0, 0, 0, 0)
+    assert history.base_text is None
+
+
+def test_step_over_the_cap_needs_confirmation(editor, monkeypatch):
+    editor.setPlainText("foo")
+    history = BulkUndoHistory(editor, max_bytes=100)
+
+    monkeypatch.setattr(history, "_confirm_unrecorded", lambda size: False)
+    assert not history.apply("foo", [(0, "foo", "bar")])
+    assert editor.toPlainText() == "foo"
+
+    monkeypatch.setattr(history, "_confirm_unrecorded", lambda size: True)
+    assert history.apply("foo", [(0, "foo", "bar")])
+    assert editor.toPlainText() == "bar"
+    assert history.memory_usage() == (0, 0, 0, 0)
+
+
+def test_undo_limit_is_persisted(make_window):
+    window = make_window()
+    window.undo_history.set_max_bytes(5 * 1024 * 1024)
+    window.save_session()
+    assert make_window().undo_history.max_bytes == 5 * 1024 * 1024
+
+
+@pytest.mark.parametrize("old, new", [
+    ("", ""), ("", "abc"), ("abc", ""), ("abc", "abc"), ("aaa", "aaaa"), ("aaaa", "aa"),
+    ("xbc", "ybc"), ("abx", "aby"), ("abab", "ab"), ("a" * 9000, "a" * 9000 + "b"),
+    ("a" * 5000 + "x" + "a" * 5000, "a" * 5000 + "y" + "a" * 5000),
+])
+def test_diff_texts_edge_cases(old, new):
+    hunks = diff_texts(old, new)
+    assert apply_hunks(old, hunks) == new
+    assert apply_hunks(new, invert_hunks(hunks)) == old
+    if old == new:
+        assert hunks == []
+    else:
+        start, removed, added = hunks[0]
+        assert len(removed) + len(added) <= abs(len(old) - len(new)) + 2
+
+
+def test_diff_texts_random_round_trip():
+    rng = random.Random(0)
+    for _ in range(500):
+        old = "".join(rng.choice("ab\n") for _ in range(rng.randint(0, 10000)))
+        start = rng.randint(0, len(old))
+        end = rng.randint(start, len(old))
+        new = old[:start] + "".join(rng.choice("ab\n") for _ in range(rng.randint(0, 50))) + old[end:]
+        hunks = diff_texts(old, new)
+        assert apply_hunks(old, hunks) == new
+        assert apply_hunks(new, invert_hunks(hunks)) == old
@@ -0,0 +1,132 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtWidgets import QApplication
+
+from OhPyMark import LinkValidator, StatCache, collect_link_targets, resolve_link_target
+
+
+def test_invalidate_dir_drops_descendants(tmp_path):
+    cache = StatCache()
+    missing = str(tmp_path / "nope" / "img" / "a.png")
+    assert cache.stat(missing) is None
+    assert cache.existing_dir(missing) == str(tmp_path)
+
+    os.makedirs(os.path.dirname(missing))
+    open(missing, "w").close()
+    assert cache.stat(missing) is None  # still cached
+
+    cache.invalidate_dir(str(tmp_path))
+    assert cache.stat(missing) is not None
+
+
+def test_invalidate_dir_keeps_siblings_with_common_prefix(tmp_path):
+    cache = StatCache()
+    sibling = str(tmp_path / "docs-old" / "a.md")
+    cache.stat(sibling)
+    cache.invalidate_dir(str(tmp_path / "docs"))
+    assert sibling in cache.entries
+
+
+def test_resolve_link_target():
+    assert resolve_link_target("img/a%20b.png#x", "/docs") == os.path.normpath("/docs/img/a b.png")
+    assert resolve_link_target("https://example.com/a.png", "/docs") is None
+    assert resolve_link_target("#section", "/docs") is None
+    assert resolve_link_target("a.md", None) is None
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        QApplication.processEvents()
+        time.sleep(0.01)
+
+
+def test_stat_cache_treats_nul_as_missing():
+    assert StatCache().stat("a\x00b.png") is None
+
+
+def test_collector_extracts_links_and_images():
+    md_text = (
+        "[doc](other.md#part) and ![fig](img/a%20b.png)\n\n"
+        "[ref][r] <https://example.com>\n\n"
+        "```\n[not](a-link.md)\n```\n\n"
+        "[r]: refs/target.md\n"
+    )
+    assert collect_link_targets(md_text) == [
+        ("link", "other.md#part"),
+        ("image", "img/a%20b.png"),
+        ("link", "refs/target.md"),
+        ("link", "https://example.com"),
+    ]
+
+
+def test_every_check_is_reported():
+    validator = LinkValidator()
+    results = []
+    validator.checked.connect(lambda *args: results.append(args))
+    validator._check("/docs/a.md", [("image", "a%00b.png")], validator._next_generation("/docs/a.md"))
+    validator._check("/docs/b.md", [("image", None)], validator._next_generation("/docs/b.md"))
+    validator.shutdown()
+
+    assert [p[:3] for p in results[0][2]] == [("image", "a%00b.png", "not found")]
+    kind, target, problem, _ = results[1][2][0]
+    assert (kind, target) == ("file", "/docs/b.md") and problem.startswith("check failed")
+
+
+def test_stale_generation_is_dropped(make_window, tmp_path):
+    window = make_window()
+    doc = str(tmp_path / "a.md")
+    problem = [("image", "x.png", "not found", str(tmp_path))]
+    old = window.link_validator._next_generation(doc)
+    latest = window.link_validator._next_generation(doc)
+
+    window.on_links_checked(doc, old, problem, [str(tmp_path)])
+    assert doc not in window.link_problems
+    window.on_links_checked(doc, latest, problem, [str(tmp_path)])
+    assert window.link_problems[doc] == problem
+
+
+def test_recheck_sees_deleted_image(make_window, tmp_path):
+    window = make_window()
+    image = tmp_path / "img" / "x.png"
+    image.parent.mkdir()
+    image.write_bytes(b"")
+    doc = tmp_path / "a.md"
+    doc.write_text("![x](img/x.png)\n", encoding="utf-8")
+    checks = []
+    window.link_validator.checked.connect(lambda *args: checks.append(args))
+
+    window.link_validator.validate_file(str(doc))
+    wait_for(lambda: len(checks) == 1)
+    assert str(doc) not in window.link_problems
+
+    image.unlink()
+    window.link_validator.validate_file(str(doc))
+    wait_for(lambda: len(checks) == 2)
+    assert [p[:3] for p in window.link_problems[str(doc)]] == [("image", "img/x.png", "not found")]
+
+
+def test_reopened_document_sees_image_deleted_meanwhile(make_window, tmp_path):
+    window = make_window()
+    image = tmp_path / "img" / "x.png"
+    image.parent.mkdir()
+    image.write_bytes(b"")
+    doc_a = tmp_path / "a.md"
+    doc_a.write_text("![x](img/x.png)\n", encoding="utf-8")
+    doc_b = tmp_path / "b.md"
+    doc_b.write_text("no links\n", encoding="utf-8")
+
+    window.load_file(str(doc_a))
+    wait_for(lambda: str(image.parent) in window.watched_dirs)
+    window.load_file(str(doc_b))
+    wait_for(lambda: str(image.parent) not in window.watched_dirs)
+
+    image.unlink()
+    window.load_file(str(doc_a))
+    wait_for(lambda: str(doc_a) in window.link_problems)
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QApplication, QPlainTextDocumentLayout
+
+from OhPyMark import OutlineIndex
+
+PIECES = [
+    "# A", "## B ##", "### C {#c}", "", "Title", "===", "Sub", "---",
+    "text", "```", "```python", "~~~", "````", "# in fence?", "- item", "> # quoted",
+]
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def make_document(text):
+    # Same layout as the QPlainTextEdit the index runs against in the editor
+    document = QTextDocument()
+    document.setDocumentLayout(QPlainTextDocumentLayout(document))
+    document.setPlainText(text)
+    return document
+
+
+def random_text(rng, lines):
+    return "\n".join(rng.choice(PIECES) for _ in range(lines))
+
+
+def random_edit(rng, document):
+    length = document.characterCount() - 1
+    start = rng.randint(0, length)
+    end = min(length, start + rng.randint(0, 20))
+    if rng.random() < 0.3:
+        insert = rng.choice(["#", "`", "\n", "=", "-", "a", "~"])
+    else:
+        insert = random_text(rng, rng.randint(0, 3))
+
+    cursor = QTextCursor(document)
+    cursor.setPosition(start)
+    cursor.setPosition(end, QTextCursor.KeepAnchor)
+    cursor.insertText(insert)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_updates_match_rebuild(app, seed):
+    rng = random.Random(seed)
+    document = make_document(random_text(rng, 15))
+    index = OutlineIndex(document)
+
+    for _ in range(100):
+        random_edit(rng, document)
+        headings = [list(h) for h in index.headings]
+        fences = list(index.fences)
+        index.rebuild()
+        assert headings == index.headings, document.toPlainText()
+        assert fences == index.fences, document.toPlainText()
+
+
+def test_fence_hides_headings(app):
+    document = make_document("# A\n```\n# not a heading\n```\n# B")
+    index = OutlineIndex(document)
+    assert [h[:2] for h in index.headings] == [[0, 1], [4, 1]]
+
+    # Removing the closing fence swallows every heading below it
+    cursor = QTextCursor(document.findBlockByNumber(3))
+    cursor.select(QTextCursor.BlockUnderCursor)
+    cursor.removeSelectedText()
+    assert [h[:2] for h in index.headings] == [[0, 1]]
+
+
+def test_render_takes_ids_and_toc_from_index(app):
+    markdown = pytest.importorskip("markdown")
+    from OhPyMark import MARKDOWN_EXTENSION_CONFIGS, MARKDOWN_EXTENSIONS, OutlineExtension
+
+    document = make_document("[TOC]\n\n# Intro\n\n## _Setup_ [docs](a.md)\n\n### Own {#custom}\n\n# Intro\n\n> # Quoted")
+    index = OutlineIndex(document)
+    html = markdown.markdown(
+        document.toPlainText(),
+        extensions=MARKDOWN_EXTENSIONS + [OutlineExtension(index)],
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS
+    )
+
+    assert index.anchors() == ["intro", "_setup_-docs", "custom", "intro_1"]
+    for anchor in index.anchors():
+        assert f'id="{anchor}"' in html
+        assert f'href="#{anchor}"' in html
+    assert "[TOC]" not in html
+    assert 'id="quoted"' in html  # not in the index, still gets the toc extension's id
+
+
+def test_changed_reports_only_edited_rows(app):
+    document = make_document("# A\n\ntext\n\n# B\n\n# C")
+    index = OutlineIndex(document)
+    changes = []
+    index.changed.connect(lambda *args: changes.append(args))
+
+    cursor = QTextCursor(document.findBlockByNumber(2))
+    cursor.insertText("more ")
+    cursor.insertText("\n\n")
+    assert changes == []  # body text and moved headings do not touch the panel
+
+    cursor = QTextCursor(document.findBlockByNumber(6))
+    cursor.movePosition(QTextCursor.EndOfBlock)
+    cursor.insertText("2")
+    assert changes == [(1, 1, 1)]
+    assert index.headings[1][1:] == [1, "B2"]
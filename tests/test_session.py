@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+import OhPyMark
+
+
+def process_events():
+    for _ in range(5):
+        QApplication.processEvents()
+
+
+@pytest.fixture
+def documents(tmp_path):
+    paths = []
+    for name in ("a.md", "b.md"):
+        path = tmp_path / name
+        path.write_text("".join(f"line {i} of {name}\n" for i in range(500)), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Paths OhPyMark opens for reading."""
+    paths = []
+
+    def spy(file, mode="r", *args, **kwargs):
+        if "r" in mode:
+            paths.append(file)
+        return open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(OhPyMark, "open", spy, raising=False)
+    return paths
+
+
+def test_session_round_trip_is_lazy(make_window, documents, opened):
+    doc_a, doc_b = documents
+    window = make_window()
+    window.resize(1200, 700)
+    window.show()
+    window.load_file(doc_a)
+    process_events()
+    cursor = window.text_editor.textCursor()
+    cursor.setPosition(1234)
+    window.text_editor.setTextCursor(cursor)
+    window.text_editor.verticalScrollBar().setValue(40)
+    window.load_file(doc_b)
+    window.switch_theme("Dark")
+    window.save_session()
+
+    opened.clear()
+    restored = make_window()
+    assert opened == []
+    assert restored.pending_document == doc_b
+    assert restored.current_file is None
+    assert restored.text_editor.toPlainText() == ""
+    assert list(restored.session_documents) == [doc_a, doc_b]
+    assert restored.current_theme == "Dark"
+
+    # The active document is read once the event loop runs, the other one on first view
+    restored.resize(1200, 700)
+    restored.show()
+    process_events()
+    assert opened == [doc_b]
+    assert restored.current_file == doc_b
+
+    restored.activate_session_document(restored.session_list.item(0))
+    process_events()
+    assert opened == [doc_b, doc_a]
+    assert restored.text_editor.textCursor().position() == 1234
+    assert restored.text_editor.verticalScrollBar().value() == 40
+
+
+def test_malformed_positions_are_ignored(make_window, documents, monkeypatch):
+    doc_a, doc_b = documents
+    errors = []
+    monkeypatch.setattr(QMessageBox, "critical", lambda *args: errors.append(args))
+    settings = make_window().settings
+    settings.setValue("session/documents", json.dumps([
+        {"path": doc_a, "cursor": "12", "scroll": None},
+        {"path": doc_b, "cursor": True, "scroll": -3},
+        {"cursor": 5},
+        "junk",
+    ]))
+    settings.setValue("session/current", doc_a)
+
+    window = make_window()
+    assert window.session_documents == {
+        doc_a: {"cursor": 0, "scroll": 0},
+        doc_b: {"cursor": 0, "scroll": 0},
+    }
+    process_events()
+    assert window.current_file == doc_a
+    assert errors == []
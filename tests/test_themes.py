@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from PyQt5.QtGui import QColor, QPalette
+from PyQt5.QtWidgets import QApplication
+
+from OhPyMark import parse_stylesheet
+
+
+def test_parse_stylesheet_splits_selector_lists():
+    rules = parse_stylesheet("A, B { color: red; } B { font-size: 14px }")
+    assert rules == {"A": {"color": "red"}, "B": {"color": "red", "font-size": "14px"}}
+
+
+def test_theme_switch_leaves_the_preview_document_alone(make_window):
+    window = make_window()
+    window.text_editor.setPlainText("# Title\n\n```python\nx = 1\n```\n")
+    document = window.preview_browser.document()
+    css = document.defaultStyleSheet()
+    font = document.defaultFont()
+
+    for theme_name in window.themes:
+        window.switch_theme(theme_name)
+        assert document.defaultStyleSheet() == css
+        assert document.defaultFont() == font
+
+    window.switch_theme("Light")
+    window.switch_theme("High Contrast")
+    theme = window.compiled_theme("High Contrast")
+    assert window.preview_browser.palette().color(QPalette.Base) == QColor("#000000")
+    assert window.preview_browser.palette().color(QPalette.Text) == QColor("#FFFFFF")
+    assert "body { background-color: #000000; color: #FFFFFF; }" in theme.export_css
+
+
+def test_theme_without_colors_resets_the_palette(make_window):
+    window = make_window()
+    default = QApplication.palette(window.preview_browser).color(QPalette.Base)
+    window.switch_theme("Dark")
+    window.themes["Plain"] = "QTextBrowser { font-size: 14px; }"
+    window.switch_theme("Plain")
+    assert window.preview_browser.palette().color(QPalette.Base) == default